@@ -9,33 +9,118 @@ A comprehensive script that combines eye tracking data from multiple participant
 and creates abbreviated AOI (Area of Interest) mappings for analysis.
 
 This script performs two main functions:
-1. Combines all Final_Processed_Data files for participants P2-P49 into a single Excel file
+1. Combines all Final_Processed_Data files for participants P2-P49 into a single
+   Parquet file (or Excel file when Parquet is disabled)
 2. Creates abbreviated AOI names and generates a legend for easier analysis
 
+By default (use_parquet=True) participant files are read from P{n}_Processed_Data.parquet
+when present, and the combined data is written as Combined_Data.parquet instead of
+Combined_Data.xlsx; this requires pyarrow. Pass use_parquet=False for the previous
+Excel-only behaviour. The abbreviated data and legend are always written as Excel.
+
 """
 
+import numpy as np
 import pandas as pd
+from openpyxl import Workbook
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 import string
 from typing import Dict, List
 
 
+def extract_participant_id(file_name: str) -> str:
+    """
+    Extract participant ID from file name.
+    
+    Args:
+        file_name (str): Name of the file
+        
+    Returns:
+        str: Participant ID
+    """
+    # Standard file format: extract participant ID before first underscore
+    return file_name.split('_')[0]
+
+
+def write_excel(data: pd.DataFrame, output_path: Path):
+    """
+    Write a DataFrame to an Excel file using a write-only workbook.
+    
+    Rows are streamed to disk instead of building the full cell graph in memory.
+    
+    Args:
+        data (pd.DataFrame): Data to save
+        output_path (Path): Destination .xlsx path
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Sheet1")
+    worksheet.append(list(data.columns))
+    for row in data.itertuples(index=False, name=None):
+        worksheet.append(tuple(None if pd.isna(value) else value for value in row))
+    workbook.save(output_path)
+
+
+def process_single_file(file_path: Path, input_columns: List[str], column_mapping: Dict[str, str],
+                        use_parquet: bool = True) -> pd.DataFrame:
+    """
+    Process a single Excel file and return formatted DataFrame.
+    
+    Defined at module level so it can be pickled and run in worker processes.
+    When use_parquet is set and a .parquet file with the same stem exists,
+    it is read instead of the Excel file.
+    
+    Args:
+        file_path (Path): Path to the Excel file
+        input_columns (List[str]): Columns to keep from the input file
+        column_mapping (Dict[str, str]): Mapping of input to output column names
+        use_parquet (bool): Prefer a sibling .parquet file when available
+        
+    Returns:
+        pd.DataFrame: Processed data from the file
+    """
+    try:
+        # Load data from Parquet if available, otherwise from Excel file
+        parquet_path = file_path.with_suffix('.parquet')
+        # Only the required columns are loaded, in input_columns order (usecols keeps file order)
+        if use_parquet and parquet_path.exists():
+            data = pd.read_parquet(parquet_path, columns=input_columns)
+        else:
+            data = pd.read_excel(file_path, usecols=input_columns)[input_columns]
+        
+        # Rename required columns and add participant ID
+        participant_id = extract_participant_id(file_path.name)
+        data = data.rename(columns=column_mapping).assign(**{'Part ID': participant_id})
+        
+        # Forward fill missing values in Chart Type column
+        data['Chart Type'] = data['Chart Type'].ffill()
+        
+        return data
+        
+    except Exception as e:
+        print(f"Error processing file {file_path.name}: {str(e)}")
+        return pd.DataFrame()
+
+
 class EyeTrackingDataProcessor:
     """
     A class to process and combine eye tracking data from multiple participants.
     """
     
-    def __init__(self, data_directory: str, participant_range: tuple = (2, 50)):
+    def __init__(self, data_directory: str, participant_range: tuple = (2, 50), use_parquet: bool = True):
         """
         Initialize the processor with configuration parameters.
         
         Args:
             data_directory (str): Path to directory containing input files
             participant_range (tuple): Range of participant numbers (start, end)
+            use_parquet (bool): Use Parquet for intermediate input/output files
         """
         # Configuration variables
         self.data_directory = Path(data_directory)
         self.participant_start, self.participant_end = participant_range
+        self.use_parquet = use_parquet
         
         # Column mappings
         self.input_columns = ['Chart Name', 'Name of AOI Hit']
@@ -80,8 +165,7 @@ class EyeTrackingDataProcessor:
         Returns:
             str: Participant ID
         """
-        # Standard file format: extract participant ID before first underscore
-        return file_name.split('_')[0]
+        return extract_participant_id(file_name)
     
     def process_single_file(self, file_path: Path) -> pd.DataFrame:
         """
@@ -93,26 +177,7 @@ class EyeTrackingDataProcessor:
         Returns:
             pd.DataFrame: Processed data from the file
         """
-        try:
-            # Load data from Excel file
-            data = pd.read_excel(file_path)
-            
-            # Extract and rename required columns
-            data = data[self.input_columns].copy()
-            data.rename(columns=self.column_mapping, inplace=True)
-            
-            # Add participant ID
-            participant_id = self.extract_participant_id(file_path.name)
-            data['Part ID'] = participant_id
-            
-            # Forward fill missing values in Chart Type column
-            data['Chart Type'] = data['Chart Type'].ffill()
-            
-            return data
-            
-        except Exception as e:
-            print(f"Error processing file {file_path.name}: {str(e)}")
-            return pd.DataFrame()
+        return process_single_file(file_path, self.input_columns, self.column_mapping, self.use_parquet)
     
     def combine_participant_data(self) -> pd.DataFrame:
         """
@@ -123,26 +188,40 @@ class EyeTrackingDataProcessor:
         """
         print("Starting data combination process...")
         
-        # Initialize empty DataFrame for combined data
-        combined_data = pd.DataFrame()
         file_names = self.generate_file_list()
         
-        # Process each file
-        processed_files = 0
+        # Collect existing input files
+        file_paths: List[Path] = []
         for file_name in file_names:
             file_path = self.data_directory / file_name
             
-            if file_path.exists():
+            # A participant may have only the Parquet intermediate
+            parquet_path = file_path.with_suffix('.parquet')
+            if self.use_parquet and parquet_path.exists():
+                print(f"Processing: {parquet_path.name}")
+                file_paths.append(file_path)
+            elif file_path.exists():
                 print(f"Processing: {file_name}")
-                file_data = self.process_single_file(file_path)
-                
-                if not file_data.empty:
-                    combined_data = pd.concat([combined_data, file_data], ignore_index=True)
-                    processed_files += 1
+                file_paths.append(file_path)
             else:
                 print(f"Warning: File not found - {file_name}")
         
+        # Read files in parallel; each workbook is parsed independently
+        worker = partial(
+            process_single_file,
+            input_columns=self.input_columns,
+            column_mapping=self.column_mapping,
+            use_parquet=self.use_parquet
+        )
+        with ProcessPoolExecutor() as executor:
+            results = list(executor.map(worker, file_paths))
+        
+        # Collect per-file frames and concatenate once at the end
+        frames: List[pd.DataFrame] = [file_data for file_data in results if not file_data.empty]
+        processed_files = len(frames)
+        
         print(f"Successfully processed {processed_files} files")
+        combined_data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
         return combined_data
     
     def create_abbreviation_legend(self, unique_aois: List[str]) -> Dict[str, str]:
@@ -165,7 +244,7 @@ class EyeTrackingDataProcessor:
     
     def save_combined_data(self, data: pd.DataFrame) -> Path:
         """
-        Save combined data to Excel file.
+        Save combined data to a Parquet intermediate (or Excel if Parquet is disabled).
         
         Args:
             data (pd.DataFrame): Combined data to save
@@ -178,8 +257,13 @@ class EyeTrackingDataProcessor:
         # Ensure output directory exists
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Save to Excel
-        data.to_excel(output_path, index=False)
+        if self.use_parquet:
+            # Save as compressed columnar intermediate
+            output_path = output_path.with_suffix('.parquet')
+            data.to_parquet(output_path, engine='pyarrow', compression='zstd', index=False)
+        else:
+            # Save to Excel
+            write_excel(data, output_path)
         print(f"Combined data saved to: {output_path}")
         
         return output_path
@@ -188,6 +272,8 @@ class EyeTrackingDataProcessor:
         """
         Create abbreviated AOI data and legend.
         
+        The 'Abbreviated AOI' column is added to the input DataFrame in place.
+        
         Args:
             data (pd.DataFrame): Combined data with full AOI names
             
@@ -203,11 +289,30 @@ class EyeTrackingDataProcessor:
         # Create abbreviation legend
         legend = self.create_abbreviation_legend(unique_aois)
         
-        # Apply abbreviations to data
-        data_copy = data.copy()
-        data_copy['Abbreviated AOI'] = data_copy['AOI'].map(legend)
+        # Apply abbreviations to data by relabelling categorical codes: one lookup per
+        # unique AOI, and the result keeps compact integer codes
+        aoi = pd.Categorical(data['AOI'])
+        categories = []
+        code_map = []
+        for name in aoi.categories:
+            abbreviation = legend.get(name)
+            if abbreviation is None:
+                # More AOIs than abbreviations: leave unmapped AOIs empty
+                code_map.append(-1)
+            else:
+                code_map.append(len(categories))
+                categories.append(abbreviation)
+        # Missing AOIs have code -1; unique() also put NaN into the legend, so map them to its entry
+        nan_abbreviation = next((abbr for name, abbr in legend.items() if pd.isna(name)), None)
+        if nan_abbreviation is not None:
+            categories.append(nan_abbreviation)
+            code_map.append(len(categories) - 1)
+        else:
+            code_map.append(-1)
+        codes = np.asarray(code_map)[aoi.codes]
+        data['Abbreviated AOI'] = pd.Categorical.from_codes(codes, categories=categories)
         
-        return data_copy, legend
+        return data, legend
     
     def save_abbreviated_data_and_legend(self, abbreviated_data: pd.DataFrame, legend: Dict[str, str]):
         """
@@ -219,13 +324,13 @@ class EyeTrackingDataProcessor:
         """
         # Save abbreviated data
         abbreviated_path = self.data_directory / self.abbreviated_data_filename
-        abbreviated_data.to_excel(abbreviated_path, index=False)
+        write_excel(abbreviated_data, abbreviated_path)
         print(f"Abbreviated data saved to: {abbreviated_path}")
         
         # Save legend
         legend_path = self.data_directory / self.legend_filename
         legend_df = pd.DataFrame(list(legend.items()), columns=['AOI', 'Abbreviation'])
-        legend_df.to_excel(legend_path, index=False)
+        write_excel(legend_df, legend_path)
         print(f"AOI abbreviation legend saved to: {legend_path}")
     
     def process_all_data(self):
@@ -318,11 +423,13 @@ if __name__ == "__main__":
 
         # Remove consecutive duplicates for each participant
         def remove_consecutive_duplicates(df):
-            df = df.copy()
-            # For each participant, remove consecutive AOIHit duplicates
-            df["lagged_AOIHit"] = df.groupby("ParticipantID")["AOIHit"].shift(1, fill_value=np.nan)
-            cleaned = df[df["AOIHit"] != df["lagged_AOIHit"]].drop(columns=["lagged_AOIHit"])
-            return cleaned.reset_index(drop=True)
+            # Data is sorted by participant, so compare each row with the previous one and
+            # keep it if the AOIHit changed or a new participant starts
+            aoi = df["AOIHit"].to_numpy()
+            pid = df["ParticipantID"].to_numpy()
+            keep = np.ones(len(df), dtype=bool)
+            keep[1:] = (aoi[1:] != aoi[:-1]) | (pid[1:] != pid[:-1])
+            return df.iloc[keep].reset_index(drop=True)
 
         cleaned_sequences = remove_consecutive_duplicates(data_filtered)
 
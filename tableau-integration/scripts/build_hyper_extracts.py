@@ -3,16 +3,28 @@ import csv
 import datetime as dt
 import json
 import fnmatch
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 try:
     from tableauhyperapi import (Connection, HyperProcess, TableDefinition, SqlType, TableName, CreateMode,
-                                 Inserter, Telemetry)
+                                 Telemetry, escape_string_literal)
 except Exception as e:
     print("Tableau Hyper API not available. Install with: pip install tableauhyperapi")
     raise
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except Exception as e:
+    print("pyarrow not available. Install with: pip install pyarrow")
+    raise
+
 # Known folders and simple schema hints per dataset (override/augment if needed)
 RESULT_FOLDERS = [
     Path("cluster-analysis/results"),
@@ -23,6 +35,23 @@ RESULT_FOLDERS = [
 DATE_FIELDS = {"timestamp", "start_time", "end_time", "date"}
 INT_FIELDS = {"participant_id", "trial", "cluster_id", "aoi_id"}
 FLOAT_FIELDS = {"x", "y", "duration", "probability", "score", "value"}
+TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d")
+# Strings accepted by float() (including "_" digit separators), checked before casting
+# so bad values become NULL
+DIGITS = r"\d(?:_?\d)*"
+NUMBER_PATTERN = (rf"(?i)^[+-]?(?:{DIGITS}\.?(?:{DIGITS})?|\.{DIGITS})(?:e[+-]?{DIGITS})?$"
+                  r"|^[+-]?(?:nan|inf|infinity)$")
+
+# SqlType instances are built once; per-column dispatch uses small integer codes
+TYPE_INT, TYPE_DOUBLE, TYPE_TIMESTAMP, TYPE_TEXT = range(4)
+SQL_INT, SQL_DOUBLE, SQL_TIMESTAMP, SQL_TEXT = SqlType.int(), SqlType.double(), SqlType.timestamp(), SqlType.text()
+SQL_TYPES = (SQL_INT, SQL_DOUBLE, SQL_TIMESTAMP, SQL_TEXT)
+# Arrow type per type code; Hyper's int is 32-bit
+ARROW_TYPES = (pa.int32(), pa.float64(), pa.timestamp("s"), pa.string())
+
+# Each conversion holds its whole CSV in memory (text table, typed copy, temp Parquet),
+# so only a few run at once
+MAX_WORKERS = min(4, os.cpu_count() or 1)
 
 # Optional fixed schema mapping loaded from schemas/schema_config.json
 SCHEMA_CONFIG_PATH = Path(__file__).resolve().parents[1] / "schemas" / "schema_config.json"
@@ -54,21 +83,21 @@ def lookup_fixed_types(root: Path, csv_path: Path) -> Optional[Dict[str, str]]:
 def str_to_sqltype(t: str) -> SqlType:
     t = t.lower()
     if t == "int":
-        return SqlType.int()
+        return SQL_INT
     if t == "double" or t == "real" or t == "float":
-        return SqlType.double()
+        return SQL_DOUBLE
     if t == "timestamp" or t == "datetime":
-        return SqlType.timestamp()
-    return SqlType.text()
+        return SQL_TIMESTAMP
+    return SQL_TEXT
 
 def infer_type(field: str, sample_values: List[str]) -> SqlType:
     f = field.lower()
     if f in INT_FIELDS:
-        return SqlType.int()
+        return SQL_INT
     if f in FLOAT_FIELDS:
-        return SqlType.double()
+        return SQL_DOUBLE
     if f in DATE_FIELDS:
-        return SqlType.timestamp()
+        return SQL_TIMESTAMP
     # Fallback: inspect samples
     def is_int(s: str) -> bool:
         try:
@@ -83,7 +112,7 @@ def infer_type(field: str, sample_values: List[str]) -> SqlType:
         except:
             return False
     def is_ts(s: str) -> bool:
-        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
+        for fmt in TIMESTAMP_FORMATS:
             try:
                 dt.datetime.strptime(s, fmt)
                 return True
@@ -92,94 +121,174 @@ def infer_type(field: str, sample_values: List[str]) -> SqlType:
         return False
     non_empty = [v for v in sample_values if v]
     if non_empty and all(is_int(v) for v in non_empty[:10]):
-        return SqlType.int()
+        return SQL_INT
     if non_empty and all(is_float(v) for v in non_empty[:10]):
-        return SqlType.double()
+        return SQL_DOUBLE
     if non_empty and any(is_ts(v) for v in non_empty[:10]):
-        return SqlType.timestamp()
-    return SqlType.text()
-
-
-def build_table_def(csv_path: Path, table_name: TableName, fixed_types: Optional[Dict[str, str]] = None) -> TableDefinition:
-    with csv_path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        headers = reader.fieldnames or []
-        # sample values by column
-        samples: Dict[str, List[str]] = {h: [] for h in headers}
-        for i, row in enumerate(reader):
-            if i >= 50:
-                break
-            for h in headers:
-                samples[h].append(row.get(h, ""))
+        return SQL_TIMESTAMP
+    return SQL_TEXT
+
+
+def read_csv_table(csv_path: Path) -> pa.Table:
+    # Single pass over the file: every column is read as text, typing happens afterwards
+    with csv_path.open("rb") as f:
+        headers = next(csv.reader([f.readline().decode("utf-8-sig")]), [])
+        f.seek(0)
+        options = pacsv.ConvertOptions(column_types={h: pa.string() for h in headers}, null_values=[""],
+                                       strings_can_be_null=True)
+        try:
+            return pacsv.read_csv(f, convert_options=options)
+        except pa.ArrowInvalid:
+            pass
+    # Ragged rows: read like csv.DictReader did, short rows padded with NULL and extra values dropped
+    with csv_path.open("r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        columns: List[List[Optional[str]]] = [[] for _ in headers]
+        for row in reader:
+            if not row:
+                continue
+            for i, values in enumerate(columns):
+                values.append((row[i] or None) if i < len(row) else None)
+    return pa.table([pa.array(values, type=pa.string()) for values in columns], names=headers)
+
+
+def detect_ts_format(sample_values: List[str]) -> Optional[str]:
+    # First timestamp format that parses every non-empty sample value
+    non_empty = [v for v in sample_values if v]
+    if not non_empty:
+        return None
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            for v in non_empty:
+                dt.datetime.strptime(v, fmt)
+        except:
+            continue
+        return fmt
+    return None
+
+
+def build_table_def(table: pa.Table, table_name: TableName,
+                    fixed_types: Optional[Dict[str, str]] = None) -> Tuple[TableDefinition, Dict[str, str]]:
+    headers = table.column_names
     table_def = TableDefinition(table_name)
+    ts_formats: Dict[str, str] = {}
+    if fixed_types and all(h in fixed_types for h in headers):
+        # Schema covers every column: no sampling needed
+        for h in headers:
+            table_def.add_column(h, str_to_sqltype(fixed_types[h]))
+        return table_def, ts_formats
+    # sample values by column
+    sample = table.slice(0, 50)
     for h in headers:
+        samples = ["" if v is None else v for v in sample.column(h).to_pylist()]
         if fixed_types and h in fixed_types:
             col_type = str_to_sqltype(fixed_types[h])
         else:
-            col_type = infer_type(h, samples.get(h, []))
+            col_type = infer_type(h, samples)
+        if col_type == SQL_TIMESTAMP:
+            fmt = detect_ts_format(samples)
+            if fmt:
+                ts_formats[h] = fmt
         table_def.add_column(h, col_type)
-    return table_def
+    return table_def, ts_formats
 
 
-def insert_csv(connection: Connection, table_def: TableDefinition, csv_path: Path):
+def strptime_exact(column: pa.ChunkedArray, fmt: str, error_is_null: bool = False) -> pa.ChunkedArray:
+    # Arrow's strptime rolls invalid dates over (2020-02-30 -> 2020-03-01). Values that do
+    # not format back unchanged (rollovers, but also unpadded input like "2020-1-5") are
+    # few, so they are re-parsed with Python's strptime, which rejects rollovers
+    parsed = pc.strptime(column, format=fmt, unit="s", error_is_null=error_is_null).combine_chunks()
+    text = column.combine_chunks()
+    exact = pc.fill_null(pc.equal(pc.strftime(parsed, format=fmt), text), False)
+    recheck = pc.and_(pc.is_valid(parsed), pc.invert(exact))
+    if not pc.any(recheck).as_py():
+        return pa.chunked_array([parsed])
+    def to_datetime(v: str) -> Optional[dt.datetime]:
+        try:
+            return dt.datetime.strptime(v, fmt)
+        except:
+            return None
+    rechecked = pa.array([to_datetime(v) for v in text.filter(recheck).to_pylist()], type=parsed.type)
+    return pa.chunked_array([pc.replace_with_mask(parsed, recheck, rechecked)])
+
+
+def parse_double(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    # Lenient float parse in Arrow: anything float() would reject becomes NULL
+    trimmed = pc.utf8_trim_whitespace(column)
+    numeric = pc.match_substring_regex(trimmed, NUMBER_PATTERN)
+    digits = pc.replace_substring(trimmed, pattern="_", replacement="")
+    return pc.if_else(numeric, digits, pa.scalar(None, pa.string())).cast(pa.float64())
+
+def parse_int(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    # Same as int(float(v)): truncate toward zero, NaN/inf become NULL
+    values = parse_double(column)
+    return pc.if_else(pc.is_finite(values), pc.trunc(values), pa.scalar(None, pa.float64())).cast(pa.int32())
+
+def parse_timestamp(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    # First exactly matching format wins, as with the strptime cascade
+    return pc.coalesce(*[strptime_exact(column, fmt, error_is_null=True) for fmt in TIMESTAMP_FORMATS])
+
+
+LENIENT_PARSERS = (parse_int, parse_double, parse_timestamp)
+
+
+def type_code(sql_type: SqlType) -> int:
+    for code, candidate in enumerate(SQL_TYPES):
+        if sql_type == candidate:
+            return code
+    return TYPE_TEXT
+
+
+def cast_column(column: pa.ChunkedArray, code: int, ts_format: Optional[str] = None) -> pa.ChunkedArray:
+    if ts_format:
+        # Parse with the format detected during sampling, no per-value format retries
+        try:
+            return strptime_exact(column, ts_format)
+        except pa.ArrowInvalid:
+            pass
+    if code == TYPE_TIMESTAMP:
+        # Arrow's ISO-8601 cast accepts more than the supported formats (e.g. "2020-01-01 10")
+        return parse_timestamp(column)
+    try:
+        return column.cast(ARROW_TYPES[code])
+    except pa.ArrowInvalid:
+        # Values a strict cast rejects (e.g. "3.0" in an int column): lenient parse with
+        # Arrow compute kernels so unparseable cells become NULL. Text casts never fail.
+        return LENIENT_PARSERS[code](column)
+
+
+def insert_csv(connection: Connection, table_def: TableDefinition, table: pa.Table,
+               ts_formats: Optional[Dict[str, str]] = None):
     # Ensure table exists
     connection.catalog.create_table(table_def)
-    # Insert rows
-    with csv_path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        rows = []
-        for row in reader:
-            values = []
-            for col in table_def.columns:
-                v = row.get(col.name, None)
-                if v is None or v == "":
-                    values.append(None)
-                    continue
-                # Convert based on type
-                if col.type == SqlType.int():
-                    try:
-                        values.append(int(float(v)))
-                    except:
-                        values.append(None)
-                elif col.type == SqlType.double():
-                    try:
-                        values.append(float(v))
-                    except:
-                        values.append(None)
-                elif col.type == SqlType.timestamp():
-                    # Try common formats
-                    parsed: Optional[dt.datetime] = None
-                    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
-                        try:
-                            parsed = dt.datetime.strptime(v, fmt)
-                            break
-                        except:
-                            continue
-                    values.append(parsed)
-                else:
-                    values.append(v)
-            rows.append(values)
-            if len(rows) >= 5000:
-                with Inserter(connection, table_def) as inserter:
-                    inserter.add_rows(rows)
-                    inserter.execute()
-                rows = []
-        if rows:
-            with Inserter(connection, table_def) as inserter:
-                inserter.add_rows(rows)
-                inserter.execute()
-
-
-def convert_csv_to_hyper(csv_path: Path, out_dir: Path, root: Path):
+    ts_formats = ts_formats or {}
+    names = [col.name.unescaped for col in table_def.columns]
+    codes = [type_code(col.type) for col in table_def.columns]
+    typed = pa.table([cast_column(table.column(name), code, ts_formats.get(name))
+                      for name, code in zip(names, codes)],
+                     names=names)
+    # Bulk load the typed columns through Hyper's COPY; no per-row Python values
+    with tempfile.TemporaryDirectory() as tmp:
+        parquet_path = Path(tmp) / "extract.parquet"
+        pq.write_table(typed, parquet_path, compression="none")
+        connection.execute_command(
+            f"COPY {table_def.table_name} FROM {escape_string_literal(str(parquet_path))} WITH (FORMAT PARQUET)")
+
+
+def convert_csv_to_hyper(hyper: HyperProcess, csv_path: Path, out_dir: Path, root: Path):
+    print(f"Converting {csv_path.relative_to(root)} → {out_dir}")
     out_dir.mkdir(parents=True, exist_ok=True)
     hyper_path = out_dir / (csv_path.stem + ".hyper")
     table_name = TableName("Extract", csv_path.stem.replace(" ", "_"))
     fixed_types = lookup_fixed_types(root, csv_path)
-    table_def = build_table_def(csv_path, table_name, fixed_types)
+    # The CSV is read once; the same table drives type inference and insertion
+    table = read_csv_table(csv_path)
+    table_def, ts_formats = build_table_def(table, table_name, fixed_types)
 
-    with HyperProcess(Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU) as hyper:
-        with Connection(hyper.endpoint, str(hyper_path), CreateMode.CREATE_AND_REPLACE) as connection:
-            insert_csv(connection, table_def, csv_path)
+    # Each conversion gets its own connection to the shared Hyper process
+    with Connection(hyper.endpoint, str(hyper_path), CreateMode.CREATE_AND_REPLACE) as connection:
+        insert_csv(connection, table_def, table, ts_formats)
     return hyper_path
 
 
@@ -206,13 +315,18 @@ def main():
 
     csvs = find_csvs(root)
     print(f"Found {len(csvs)} CSV files to convert.")
-    for csv_path in csvs:
-        rel = csv_path.relative_to(root)
-        target_dir = out_dir / rel.parent
-        target_dir.mkdir(parents=True, exist_ok=True)
-        print(f"Converting {rel} → {target_dir}")
-        hyper_path = convert_csv_to_hyper(csv_path, target_dir, root)
-        print(f"✓ Created {hyper_path}")
+    # One Hyper process for the whole run; CSVs are converted concurrently
+    with HyperProcess(Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU) as hyper:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = []
+            for csv_path in csvs:
+                rel = csv_path.relative_to(root)
+                target_dir = out_dir / rel.parent
+                target_dir.mkdir(parents=True, exist_ok=True)
+                futures.append(executor.submit(convert_csv_to_hyper, hyper, csv_path, target_dir, root))
+            for future in futures:
+                hyper_path = future.result()
+                print(f"✓ Created {hyper_path}")
 
 
 if __name__ == "__main__":
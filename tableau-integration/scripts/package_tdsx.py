@@ -17,8 +17,10 @@ def package_tdsx(tds: Path, hyper: Path, out: Path):
     out.parent.mkdir(parents=True, exist_ok=True)
     with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as z:
         # In .tdsx, the .tds sits at root, and extracts typically under Data/Extracts
-        z.write(tds, arcname=tds.name)
-        z.write(hyper, arcname=f"Data/Extracts/{hyper.name}")
+        # The small XML .tds deflates well even at the fastest level
+        z.write(tds, arcname=tds.name, compresslevel=1)
+        # .hyper extracts are already compressed, so store them as-is
+        z.write(hyper, arcname=f"Data/Extracts/{hyper.name}", compress_type=zipfile.ZIP_STORED)
     print(f"Created {out}")
 
 
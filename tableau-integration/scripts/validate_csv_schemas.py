@@ -5,7 +5,16 @@ import json
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:
+    # Optional: without pyarrow every file is validated with the row-level scan
+    pa = None
+
 SCHEMA_CONFIG_PATH = Path(__file__).resolve().parents[1] / "schemas" / "schema_config.json"
+TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d")
 
 TYPE_CHECKERS = {
     "int": lambda s: s == "" or s is None or _is_int(s),
@@ -30,7 +39,7 @@ def _is_float(s: str) -> bool:
 
 def _is_ts(s: str) -> bool:
     import datetime as dt
-    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
+    for fmt in TIMESTAMP_FORMATS:
         try:
             dt.datetime.strptime(s, fmt)
             return True
@@ -57,22 +66,77 @@ def lookup_schema(root: Path, csv_path: Path, schema_map: Dict[str, Dict[str, Di
     return None
 
 
-def validate_csv(csv_path: Path, schema: Dict[str, str]) -> List[Tuple[int, str, str]]:
+def scan_rows(csv_path: Path, schema: Dict[str, str]) -> List[Tuple[int, str, str]]:
     errors: List[Tuple[int, str, str]] = []
-    with csv_path.open("r", newline="", encoding="utf-8") as f:
+    with csv_path.open("r", newline="", encoding="utf-8-sig") as f:
         reader = csv.DictReader(f)
         missing_cols = [c for c in schema.keys() if c not in (reader.fieldnames or [])]
         for c in missing_cols:
             errors.append((0, c, "missing column"))
+        # Resolve checkers once per column rather than per cell
+        checks = [(col, t, TYPE_CHECKERS.get(t, TYPE_CHECKERS["text"])) for col, t in schema.items()]
         for i, row in enumerate(reader, start=2):  # header is line 1
-            for col, t in schema.items():
-                checker = TYPE_CHECKERS.get(t, TYPE_CHECKERS["text"])
+            for col, t, checker in checks:
                 val = row.get(col, "")
                 if not checker(val):
                     errors.append((i, col, f"expected {t}"))
     return errors
 
 
+def column_conforms(column: "pa.ChunkedArray", t: str) -> bool:
+    # Conservative vectorized check; False means the column needs the row-level scan
+    try:
+        if t == "int":
+            values = column.cast(pa.float64())
+            return not pc.any(pc.invert(pc.is_finite(values))).as_py()
+        if t == "double":
+            column.cast(pa.float64())
+            return True
+    except pa.ArrowInvalid:
+        return False
+    if t == "timestamp":
+        parsed = None
+        for fmt in TIMESTAMP_FORMATS:
+            # Arrow's strptime rolls invalid dates over (2020-02-30 -> 2020-03-01) and accepts
+            # values Python rejects, so only values that format back unchanged count as valid
+            values = pc.strptime(column, format=fmt, unit="s", error_is_null=True)
+            valid = pc.fill_null(pc.equal(pc.strftime(values, format=fmt), column), False)
+            parsed = valid if parsed is None else pc.or_(parsed, valid)
+        return not pc.any(pc.and_(pc.is_valid(column), pc.invert(parsed))).as_py()
+    return True
+
+
+def validate_csv(csv_path: Path, schema: Dict[str, str]) -> List[Tuple[int, str, str]]:
+    if pa is None:
+        return scan_rows(csv_path, schema)
+    with csv_path.open("r", newline="", encoding="utf-8-sig") as f:
+        headers = next(csv.reader(f), [])
+    if len(set(headers)) != len(headers):
+        # Duplicated header names: Arrow cannot address the column, the row-level scan can
+        return scan_rows(csv_path, schema)
+    errors: List[Tuple[int, str, str]] = []
+    for c in schema.keys():
+        if c not in headers:
+            errors.append((0, c, "missing column"))
+    present = [c for c in schema if c in headers]
+    if not present:
+        return errors
+    try:
+        # Only schema columns are read, so other columns are never type-inferred
+        options = pacsv.ConvertOptions(column_types={col: pa.string() for col in present}, null_values=[""],
+                                       strings_can_be_null=True, include_columns=present,
+                                       include_missing_columns=True)
+        table = pacsv.read_csv(csv_path, convert_options=options)
+    except pa.ArrowInvalid:
+        # Malformed file (e.g. ragged rows): let the row-level scan report it
+        return scan_rows(csv_path, schema)
+    # Only columns that fail the vectorized check are rescanned to pinpoint lines
+    failing = {col: schema[col] for col in present if not column_conforms(table.column(col), schema[col])}
+    if failing:
+        errors.extend(scan_rows(csv_path, failing))
+    return errors
+
+
 def find_csvs(root: Path) -> List[Path]:
     return [p for p in root.glob("**/*.csv") if p.stat().st_size > 0]
 